@@ -18,7 +18,8 @@ from six import iterkeys, iteritems
 from six.moves.urllib_parse import quote_plus
 import attr
 
-from .utils import (BeautifulSoup, make_coursera_absolute_url,
+from .utils import (BeautifulSoup, FAST_HTML_PARSER,
+                    make_coursera_absolute_url,
                     extend_supplement_links, clean_url, clean_filename,
                     is_debug_run, unescape_html)
 from .network import get_reply, get_page, post_page_and_reply
@@ -164,6 +165,12 @@ class MarkupToHTMLConverter(object):
         if not mathjax_cdn_url:
             mathjax_cdn_url = INSTRUCTIONS_HTML_MATHJAX_URL
         self._mathjax_cdn_url = mathjax_cdn_url
+        # The injected style only depends on the MathJax URL, so build it
+        # once instead of once per converted page
+        self._css = "".join([
+            INSTRUCTIONS_HTML_INJECTION_PRE,
+            mathjax_cdn_url,
+            INSTRUCTIONS_HTML_INJECTION_AFTER])
 
     def __call__(self, markup):
         """
@@ -196,11 +203,7 @@ class MarkupToHTMLConverter(object):
         soup.insert(0, meta)
 
         # 1. Inject basic CSS style
-        css = "".join([
-            INSTRUCTIONS_HTML_INJECTION_PRE,
-            self._mathjax_cdn_url,
-            INSTRUCTIONS_HTML_INJECTION_AFTER])
-        css_soup = BeautifulSoup(css)
+        css_soup = BeautifulSoup(self._css)
         soup.append(css_soup)
 
         # 2. Replace <text> with <p>
@@ -687,8 +690,7 @@ class CourseraOnDemand(object):
                     logging.info('Creating [%s] directories...', head)
                     os.makedirs(self._course_name + "/notebook/" + head + "/")
 
-                r = requests.get(tmp_url.replace(" ", "%20"),
-                                 cookies=self._session.cookies)
+                r = self._session.get(tmp_url.replace(" ", "%20"))
                 if not os.path.exists(self._course_name + "/notebook/" + head + "/" + tail):
                     logging.info('Downloading %s into %s', tail, head)
                     with open(self._course_name + "/notebook/" + head + "/" + tail, 'wb+') as f:
@@ -713,8 +715,7 @@ class CourseraOnDemand(object):
                     logging.info('Creating [%s] directories...', head)
                     os.makedirs(self._course_name + "/notebook/" + head + "/")
 
-                r = requests.get(tmp_url.replace(" ", "%20"),
-                                 cookies=self._session.cookies)
+                r = self._session.get(tmp_url.replace(" ", "%20"))
                 if not os.path.exists(self._course_name + "/notebook/" + head + "/" + tail):
                     logging.info(
                         'Downloading Jupyter %s into %s', tail, head)
@@ -1298,7 +1299,7 @@ class CourseraOnDemand(object):
             ...
         }
         """
-        soup = BeautifulSoup(text)
+        soup = BeautifulSoup(text, FAST_HTML_PARSER)
         asset_tags_map = {}
 
         for asset in soup.find_all('asset'):
@@ -1580,7 +1581,7 @@ class CourseraOnDemand(object):
             ]
         }
         """
-        soup = BeautifulSoup(text)
+        soup = BeautifulSoup(text, FAST_HTML_PARSER)
         links = [item['href'].strip()
                  for item in soup.find_all('a') if 'href' in item.attrs]
         links = sorted(list(set(links)))
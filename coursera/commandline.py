@@ -76,7 +76,16 @@ def parse_args(args=None):
         default=1,
         type=int,
         help='number of parallel jobs to use for '
-        'downloading resources. (Default: 1)')
+        'extracting links and downloading resources. (Default: 1)')
+
+    group_basic.add_argument(
+        '--connections',
+        dest='connections',
+        action='store',
+        default=1,
+        type=int,
+        help='number of connections used by the built-in downloader '
+        'to fetch a single file. (Default: 1)')
 
     group_basic.add_argument(
         '--download-delay',
@@ -434,6 +443,14 @@ def parse_args(args=None):
         default=False,
         help='cache course syllabus into a file')
 
+    group_debug.add_argument(
+        '--cache-http',
+        dest='cache_http',
+        action='store_true',
+        default=False,
+        help='cache pages that carry ETag/Last-Modified headers and only'
+        ' download them again if they have changed on the server')
+
     group_debug.add_argument(
         '--version',
         dest='version',
@@ -126,7 +126,7 @@ def login(session, username, password, class_name=None):
     # Hit class url
     if class_name is not None:
         class_url = CLASS_URL.format(class_name=class_name)
-        r = requests.get(class_url, allow_redirects=False)
+        r = session.get(class_url, allow_redirects=False)
         try:
             r.raise_for_status()
         except requests.exceptions.HTTPError as e:
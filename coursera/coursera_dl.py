@@ -43,28 +43,32 @@ For further documentation and examples, visit the project's home at:
 
 
 import json
+import hashlib
 import logging
 import os
 import re
 import time
 import shutil
 
-from distutils.version import LooseVersion as V
+from collections import OrderedDict
+from functools import partial
 
-
-# Test versions of some critical modules.
-# We may, perhaps, want to move these elsewhere.
-import bs4
-import six
 import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+
+try:  # Workaround for broken Debian/Ubuntu packages? (See issue #331)
+    from requests.packages.urllib3.util import make_headers
+    from requests.packages.urllib3.util.retry import Retry
+except ImportError:
+    from urllib3.util import make_headers
+    from urllib3.util.retry import Retry
 
 from .cookies import (
     AuthenticationFailed, ClassNotFound,
     get_cookies_for_class, make_cookie_values, TLSAdapter, login)
 from .define import (CLASS_URL, ABOUT_URL, PATH_CACHE)
 from .downloaders import get_downloader
-from .workflow import CourseraDownloader
-from .parallel import ConsecutiveDownloader, ParallelDownloader
+from .httpcache import HTTPCache, CachingTLSAdapter, HTTP_CACHE_FILENAME
 from .utils import (clean_filename, get_anchor_format, mkdir_p, fix_url,
                     print_ssl_error_message,
                     decode_input, BeautifulSoup, is_debug_run,
@@ -81,30 +85,107 @@ from coursera import __version__
 # URL containing information about outdated modules
 _SEE_URL = " See https://github.com/coursera-dl/coursera/issues/139"
 
-assert V(requests.__version__) >= V('2.4'), "Upgrade requests!" + _SEE_URL
-assert V(six.__version__) >= V('1.5'), "Upgrade six!" + _SEE_URL
-assert V(bs4.__version__) >= V('4.1'), "Upgrade bs4!" + _SEE_URL
+# Separator line used in the summaries printed at the end of a run
+_SEP = '-' * 80
+
+
+def _version_tuple(version, parts=2):
+    """
+    Convert a version string into a tuple of integers that can be compared.
+
+    Only the leading numeric components are used, so suffixes such as
+    'rc1' or '.post0' are ignored.
+
+    @param version: Version string, e.g. '2.25.1'.
+    @type version: str
+
+    @param parts: Number of components to keep.
+    @type parts: int
+
+    @return: Tuple of integers, e.g. (2, 25).
+    @rtype: tuple
+    """
+    match = re.match(r'\d+(?:\.\d+)*', version)
+    if match is None:
+        return ()
+    return tuple(int(part) for part in match.group(0).split('.')[:parts])
 
 
-def get_session():
+def _check_versions():
+    """
+    Test versions of some critical modules.
+
+    This is called from main() rather than at import time, so that
+    importing this module (or running --help) does not pay for it.
+    """
+    import bs4
+    import six
+
+    assert _version_tuple(requests.__version__) >= (2, 4), \
+        "Upgrade requests!" + _SEE_URL
+    assert _version_tuple(six.__version__) >= (1, 5), \
+        "Upgrade six!" + _SEE_URL
+    assert _version_tuple(bs4.__version__) >= (4, 1), \
+        "Upgrade bs4!" + _SEE_URL
+
+
+def get_session(pool_maxsize=DEFAULT_POOLSIZE, http_cache=None):
     """
     Create a session with TLS v1.2 certificate.
+
+    @param pool_maxsize: Maximum number of connections kept alive per host.
+        Should not be smaller than the number of parallel downloads,
+        otherwise connections are dropped and re-negotiated.
+    @type pool_maxsize: int
+
+    @param http_cache: Cache used to send conditional requests for pages
+        that were downloaded before. If None, nothing is cached.
+    @type http_cache: HTTPCache
     """
 
+    # Transient failures (dropped connections, overloaded servers, rate
+    # limiting) are retried by urllib3 with exponential backoff, honouring
+    # Retry-After. Only idempotent requests are retried, and the last
+    # response is returned instead of raising so that callers report it
+    # as before.
+    max_retries = Retry(total=5, backoff_factor=1,
+                        status_forcelist=(429, 500, 502, 503, 504),
+                        raise_on_status=False)
+
     session = requests.Session()
-    session.mount('https://', TLSAdapter())
+
+    # Ask for every content coding urllib3 can decode here: besides gzip
+    # and deflate this includes br and zstd when the optional brotli and
+    # zstandard packages are installed
+    session.headers['Accept-Encoding'] = make_headers(
+        accept_encoding=True)['accept-encoding']
+
+    if http_cache is None:
+        adapter = TLSAdapter(pool_maxsize=pool_maxsize,
+                             max_retries=max_retries)
+    else:
+        adapter = CachingTLSAdapter(http_cache, pool_maxsize=pool_maxsize,
+                                    max_retries=max_retries)
+    session.mount('https://', adapter)
+
+    # Some assets are still served over plain HTTP; reuse their
+    # connections the same way
+    session.mount('http://', HTTPAdapter(pool_maxsize=pool_maxsize,
+                                         max_retries=max_retries))
 
     return session
 
 
-def list_courses(args):
+def list_courses(session, args):
     """
     List enrolled courses.
 
+    @param session: Requests session.
+    @type session: requests.Session
+
     @param args: Command-line arguments.
     @type args: namedtuple
     """
-    session = get_session()
     login(session, args.username, args.password)
     extractor = CourseraExtractor(session)
     courses = extractor.list_courses()
@@ -113,11 +194,101 @@ def list_courses(args):
         logging.info(course)
 
 
-def download_on_demand_class(session, args, class_name):
+def get_syllabus_cache_filename(args, class_name):
+    """
+    Return the path of the parsed syllabus cache for the given class.
+
+    The file name contains a hash of the options that affect syllabus
+    parsing, so runs with different options do not reuse each other's
+    entries.
+
+    @param args: Command-line arguments.
+    @type args: namedtuple
+
+    @param class_name: Class name.
+    @type class_name: str
+
+    @return: Path to the cache file in PATH_CACHE.
+    @rtype: str
+    """
+    options = (class_name,
+               args.reverse,
+               args.unrestricted_filenames,
+               args.subtitle_language,
+               args.video_resolution,
+               args.download_quizzes,
+               args.mathjax_cdn_url,
+               args.download_notebooks)
+    key = hashlib.sha1(repr(options).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(PATH_CACHE, '%s-%s.syllabus.json' % (class_name, key))
+
+
+def get_ignored_formats(args):
+    """
+    Parse the comma-separated list of formats given by --ignore-formats.
+
+    @param args: Command-line arguments.
+    @type args: namedtuple
+
+    @return: List of formats that should not be downloaded.
+    @rtype: [str]
+    """
+    if args.ignore_formats:
+        return args.ignore_formats.split(",")
+    return []
+
+
+def make_downloader_factory(session, args):
+    """
+    Return a function that creates a downloader wrapper for a class.
+
+    The choice of downloader and of parallel or consecutive execution
+    only depends on the command-line arguments, so it is made once here
+    instead of once per class.
+
+    @param session: Requests session.
+    @type session: requests.Session
+
+    @param args: Command-line arguments.
+    @type args: namedtuple
+
+    @return: Function that takes a class name and returns a downloader
+        wrapper.
+    @rtype: function
+    """
+    # Imported here so that commands which do not download anything
+    # (e.g. --list-courses) do not load the downloading machinery
+    from .parallel import ConsecutiveDownloader, ParallelDownloader
+
+    if args.jobs > 1:
+        wrap_downloader = partial(ParallelDownloader, processes=args.jobs)
+    else:
+        wrap_downloader = ConsecutiveDownloader
+
+    def make_downloader(class_name):
+        return wrap_downloader(get_downloader(session, class_name, args))
+
+    return make_downloader
+
+
+def download_on_demand_class(session, args, class_name, extractor=None,
+                             make_downloader=None, ignored_formats=None):
     """
     Download all requested resources from the on-demand class given
     in class_name.
 
+    @param extractor: Extractor to reuse across classes. A new one is
+        created if not given.
+    @type extractor: CourseraExtractor
+
+    @param make_downloader: Factory returned by make_downloader_factory.
+        A new one is created if not given.
+    @type make_downloader: function
+
+    @param ignored_formats: Formats that should not be downloaded. Parsed
+        from args if not given.
+    @type ignored_formats: [str]
+
     @return: Tuple of (bool, bool), where the first bool indicates whether
         errors occurred while parsing syllabus, the second bool indicates
         whether the course appears to be completed.
@@ -125,9 +296,10 @@ def download_on_demand_class(session, args, class_name):
     """
 
     error_occurred = False
-    extractor = CourseraExtractor(session)
+    if extractor is None:
+        extractor = CourseraExtractor(session)
 
-    cached_syllabus_filename = '%s-syllabus-parsed.json' % class_name
+    cached_syllabus_filename = get_syllabus_cache_filename(args, class_name)
     if args.cache_syllabus and os.path.isfile(cached_syllabus_filename):
         modules = slurp_json(cached_syllabus_filename)
     else:
@@ -139,24 +311,28 @@ def download_on_demand_class(session, args, class_name):
             args.video_resolution,
             args.download_quizzes,
             args.mathjax_cdn_url,
-            args.download_notebooks
+            args.download_notebooks,
+            args.jobs
         )
+        if args.cache_syllabus and not error_occurred:
+            spit_json(modules, cached_syllabus_filename)
 
-    if is_debug_run or args.cache_syllabus():
-        spit_json(modules, cached_syllabus_filename)
+    if is_debug_run():
+        spit_json(modules, '%s-syllabus-parsed.json' % class_name)
 
     if args.only_syllabus:
         return error_occurred, False
 
-    downloader = get_downloader(session, class_name, args)
-    downloader_wrapper = ParallelDownloader(downloader, args.jobs) \
-        if args.jobs > 1 else ConsecutiveDownloader(downloader)
+    if make_downloader is None:
+        make_downloader = make_downloader_factory(session, args)
+    if ignored_formats is None:
+        ignored_formats = get_ignored_formats(args)
 
-    # obtain the resources
+    from .workflow import CourseraDownloader
 
-    ignored_formats = []
-    if args.ignore_formats:
-        ignored_formats = args.ignore_formats.split(",")
+    downloader_wrapper = make_downloader(class_name)
+
+    # obtain the resources
 
     course_downloader = CourseraDownloader(
         downloader_wrapper,
@@ -182,36 +358,36 @@ def download_on_demand_class(session, args, class_name):
 
 
 def print_skipped_urls(skipped_urls):
+    if not logging.getLogger().isEnabledFor(logging.INFO):
+        return
     logging.info('The following URLs (%d) have been skipped and not '
-                 'downloaded:', len(skipped_urls))
-    logging.info('(if you want to download these URLs anyway, please '
-                 'add "--disable-url-skipping" option)')
-    logging.info('-' * 80)
-    for url in skipped_urls:
-        logging.info(url)
-    logging.info('-' * 80)
+                 'downloaded:\n'
+                 '(if you want to download these URLs anyway, please '
+                 'add "--disable-url-skipping" option)\n%s\n%s\n%s',
+                 len(skipped_urls), _SEP, '\n'.join(skipped_urls), _SEP)
 
 
 def print_failed_urls(failed_urls):
-    logging.info('The following URLs (%d) could not be downloaded:',
-                 len(failed_urls))
-    logging.info('-' * 80)
-    for url in failed_urls:
-        logging.info(url)
-    logging.info('-' * 80)
+    if not logging.getLogger().isEnabledFor(logging.INFO):
+        return
+    logging.info('The following URLs (%d) could not be downloaded:\n'
+                 '%s\n%s\n%s',
+                 len(failed_urls), _SEP, '\n'.join(failed_urls), _SEP)
 
 
-def download_class(session, args, class_name):
+def download_class(session, args, class_name, **kwargs):
     """
     Try to download on-demand class.
 
+    Extra keyword arguments are passed to download_on_demand_class.
+
     @return: Tuple of (bool, bool), where the first bool indicates whether
         errors occurred while parsing syllabus, the second bool indicates
         whether the course appears to be completed.
     @rtype: (bool, bool)
     """
     logging.debug('Downloading new style (on demand) class %s', class_name)
-    return download_on_demand_class(session, args, class_name)
+    return download_on_demand_class(session, args, class_name, **kwargs)
 
 
 def main():
@@ -221,18 +397,28 @@ def main():
 
     args = parse_args()
     logging.info('coursera_dl version %s', __version__)
-    completed_classes = []
-    classes_with_errors = []
+    _check_versions()
+    # class_name -> (error_occurred, completed)
+    results = OrderedDict()
 
-    mkdir_p(PATH_CACHE, 0o700)
-    if args.clear_cache:
+    if args.clear_cache and os.path.exists(PATH_CACHE):
         shutil.rmtree(PATH_CACHE)
+    mkdir_p(PATH_CACHE, 0o700)
+
+    http_cache = None
+    if args.cache_http:
+        http_cache = HTTPCache(os.path.join(PATH_CACHE, HTTP_CACHE_FILENAME))
+
+    # One session (and thus one connection pool) is shared by all classes
+    # and by all download threads
+    session = get_session(
+        max(DEFAULT_POOLSIZE, args.jobs * max(args.connections, 2)),
+        http_cache)
     if args.list_courses:
         logging.info('Listing enrolled courses')
-        list_courses(args)
+        list_courses(session, args)
         return
 
-    session = get_session()
     if args.cookies_cauth:
         session.cookies.set('CAUTH', args.cookies_cauth)
     else:
@@ -240,16 +426,21 @@ def main():
     if args.specialization:
         args.class_names = expand_specializations(session, args.class_names)
 
+    # These only depend on the command-line arguments, so they are shared
+    # by all classes
+    extractor = CourseraExtractor(session)
+    make_downloader = make_downloader_factory(session, args)
+    ignored_formats = get_ignored_formats(args)
+
     for class_index, class_name in enumerate(args.class_names):
         try:
             logging.info('Downloading class: %s (%d / %d)',
                          class_name, class_index + 1, len(args.class_names))
-            error_occurred, completed = download_class(
-                session, args, class_name)
-            if completed:
-                completed_classes.append(class_name)
-            if error_occurred:
-                classes_with_errors.append(class_name)
+            results[class_name] = download_class(
+                session, args, class_name,
+                extractor=extractor,
+                make_downloader=make_downloader,
+                ignored_formats=ignored_formats)
         except requests.exceptions.HTTPError as e:
             logging.error('HTTPError %s', e)
             if is_debug_run():
@@ -270,13 +461,21 @@ def main():
                          args.download_delay)
             time.sleep(args.download_delay)
 
+    completed_classes = [class_name
+                         for class_name, (_, completed) in results.items()
+                         if completed]
+    classes_with_errors = [class_name
+                           for class_name, (error_occurred, _)
+                           in results.items()
+                           if error_occurred]
+
     if completed_classes:
-        logging.info('-' * 80)
-        logging.info(
-            "Classes which appear completed: " + " ".join(completed_classes))
+        logging.info(_SEP)
+        logging.info('Classes which appear completed: %s',
+                     ' '.join(completed_classes))
 
     if classes_with_errors:
-        logging.info('-' * 80)
+        logging.info(_SEP)
         logging.info('The following classes had errors during the syllabus'
                      ' parsing stage. You may want to review error messages and'
                      ' courses (sometimes enrolling to the course or switching'
@@ -17,6 +17,14 @@ except ImportError:
 
 KEYRING_SERVICE_NAME = 'coursera-dl'
 
+_IS_WINDOWS = platform.system() == 'Windows'
+
+# Results of get_config_paths, keyed by config name
+_config_paths_cache = {}
+
+# Credentials found by authenticate_through_netrc, keyed by the path argument
+_netrc_credentials_cache = {}
+
 
 class CredentialsError(BaseException):
     """
@@ -76,7 +84,17 @@ def get_config_paths(config_name):  # pragma: no test
     defaults until we succeed or have depleted all possibilities.
     """
 
-    if platform.system() != 'Windows':
+    if config_name not in _config_paths_cache:
+        _config_paths_cache[config_name] = _build_config_paths(config_name)
+
+    return _config_paths_cache[config_name]
+
+
+def _build_config_paths(config_name):
+    """
+    Build the list of config file paths for get_config_paths.
+    """
+    if not _IS_WINDOWS:
         return [None]
 
     # Now, we only treat the case of Windows
@@ -103,9 +121,17 @@ def get_config_paths(config_name):  # pragma: no test
 
     leading_chars = [".", "_"]
 
-    res = [''.join([directory, os.sep, lc, config_name])
-           for directory in all_dirs
-           for lc in leading_chars]
+    # Drop duplicates (e.g. when HOMEDRIVE+HOMEPATH equals USERPROFILE),
+    # keeping the first occurrence so that the search order is preserved
+    res = []
+    seen = set()
+    for directory in all_dirs:
+        for lc in leading_chars:
+            path = ''.join([directory, os.sep, lc, config_name])
+            normalized = os.path.normcase(os.path.normpath(path))
+            if normalized not in seen:
+                seen.add(normalized)
+                res.append(path)
 
     return res
 
@@ -116,13 +142,26 @@ def authenticate_through_netrc(path=None):
 
     Raises CredentialsError if no valid netrc file is found.
     """
+    if path in _netrc_credentials_cache:
+        return _netrc_credentials_cache[path]
+
     errors = []
     netrc_machine = 'coursera-dl'
-    paths = [path] if path else get_config_paths("netrc")
-    for path in paths:
+    if path:
+        paths = [path]
+    else:
+        # Skip candidates that do not exist instead of letting netrc try
+        # (and fail) to open each of them. None stands for the default
+        # location, which netrc resolves itself.
+        paths = [p for p in get_config_paths("netrc")
+                 if p is None or os.path.isfile(p)]
+        if not paths:
+            errors.append('No netrc file found in: ' +
+                          ', '.join(get_config_paths("netrc")))
+    for candidate in paths:
         try:
-            logging.debug('Trying netrc file %s', path)
-            auths = netrc.netrc(path).authenticators(netrc_machine)
+            logging.debug('Trying netrc file %s', candidate)
+            auths = netrc.netrc(candidate).authenticators(netrc_machine)
         except (IOError, netrc.NetrcParseError) as e:
             errors.append(e)
         else:
@@ -130,6 +169,7 @@ def authenticate_through_netrc(path=None):
                 errors.append('Didn\'t find any credentials for ' +
                               netrc_machine)
             else:
+                _netrc_credentials_cache[path] = auths[0], auths[2]
                 return auths[0], auths[2]
 
     error_messages = '\n'.join(str(e) for e in errors)
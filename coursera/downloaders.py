@@ -10,15 +10,31 @@ namely, aria2c, axel, curl, and wget.
 from __future__ import print_function
 
 import logging
-import math
 import os
+import posixpath
+import random
+import re
 import subprocess
 import sys
+import threading
 import time
 
+from multiprocessing.dummy import Pool
+
 import requests
 
-from six import iteritems
+try:  # Workaround for broken Debian/Ubuntu packages? (See issue #331)
+    from requests.packages.urllib3.exceptions import \
+        HTTPError as Urllib3HTTPError
+except ImportError:
+    from urllib3.exceptions import HTTPError as Urllib3HTTPError
+
+from six.moves.urllib_parse import urlparse
+
+
+# Seconds that NativeDownloader waits before each retry of a failed download
+WAIT_INTERVALS = (2, 4, 8)
+
 
 #
 # Below are file downloaders, they are wrappers for external downloaders.
@@ -82,21 +98,39 @@ class ExternalDownloader(Downloader):
         self.session = session
         self.bin = bin or self.__class__.bin
         self.downloader_arguments = downloader_arguments or []
+        self._cookie_values_cache = {}
 
         if not self.bin:
             raise RuntimeError("No bin specified")
 
+    def _get_cookie_values(self, url):
+        """
+        Return the Cookie header that the session would send to the url.
+
+        The header only depends on the scheme, host and directory of the
+        url (for path-restricted cookies) and on the cookies in the jar,
+        so it is computed once for all files in the same directory.
+        """
+        scheme, netloc, path = urlparse(url)[:3]
+        key = (scheme, netloc, posixpath.dirname(path),
+               len(self.session.cookies))
+
+        if key not in self._cookie_values_cache:
+            req = requests.models.Request()
+            req.method = 'GET'
+            req.url = url
+
+            self._cookie_values_cache[key] = \
+                requests.cookies.get_cookie_header(self.session.cookies, req)
+
+        return self._cookie_values_cache[key]
+
     def _prepare_cookies(self, command, url):
         """
         Extract cookies from the requests session and add them to the command
         """
 
-        req = requests.models.Request()
-        req.method = 'GET'
-        req.url = url
-
-        cookie_values = requests.cookies.get_cookie_header(
-            self.session.cookies, req)
+        cookie_values = self._get_cookie_values(url)
 
         if cookie_values:
             self._add_cookies(command, cookie_values)
@@ -130,7 +164,10 @@ class ExternalDownloader(Downloader):
 
         logging.debug('Executing %s: %s', self.bin, command)
         try:
-            subprocess.call(command)
+            # Descriptors opened by Python 3 are not inheritable anyway
+            # (PEP 446), so there is nothing to close in the child, and
+            # not asking for it lets subprocess use posix_spawn/vfork
+            subprocess.call(command, close_fds=False)
         except OSError as e:
             msg = "{0}. Are you sure that '{1}' is the right bin?".format(
                 e, self.bin)
@@ -189,7 +226,8 @@ class Aria2Downloader(ExternalDownloader):
     def _create_command(self, url, filename):
         return [self.bin, url, '-o', filename,
                 '--check-certificate=false', '--log-level=notice',
-                '--max-connection-per-server=4', '--min-split-size=1M']
+                '--max-connection-per-server=4', '--min-split-size=1M',
+                '--file-allocation=none']
 
 
 class AxelDownloader(ExternalDownloader):
@@ -211,6 +249,10 @@ class AxelDownloader(ExternalDownloader):
         return [self.bin, '-o', filename, '-n', '4', '-a', url]
 
 
+# Full progress bar, sliced by DownloadProgress.calc_percent
+_PROGRESS_BAR = '#' * 50
+
+
 def format_bytes(bytes):
     """
     Get human readable version of given bytes.
@@ -220,10 +262,8 @@ def format_bytes(bytes):
         return 'N/A'
     if type(bytes) is str:
         bytes = float(bytes)
-    if bytes == 0.0:
-        exponent = 0
-    else:
-        exponent = int(math.log(bytes, 1024.0))
+    # Every factor of 1024 adds 10 bits
+    exponent = max(0, (int(bytes).bit_length() - 1) // 10)
     suffix = ['B', 'KB', 'MB', 'GB', 'TB', 'PB', 'EB', 'ZB', 'YB'][exponent]
     converted = float(bytes) / float(1024 ** exponent)
     return '{0:.2f}{1}'.format(converted, suffix)
@@ -235,6 +275,9 @@ class DownloadProgress(object):
     Inspired by https://github.com/rg3/youtube-dl
     """
 
+    # Minimum number of seconds between two progress lines
+    report_interval = 0.25
+
     def __init__(self, total):
         if total in [0, '0', None]:
             self._total = None
@@ -244,9 +287,15 @@ class DownloadProgress(object):
         self._current = 0
         self._start = 0
         self._now = 0
+        self._last_report = None
 
         self._finished = False
 
+        # The progress bar is redrawn with carriage returns, which is only
+        # useful on a terminal. When the output is redirected to a file or
+        # a pipe it would just fill it with garbage.
+        self._quiet = not sys.stdout.isatty()
+
     def start(self):
         self._now = time.time()
         self._start = self._now
@@ -274,7 +323,7 @@ class DownloadProgress(object):
             return '100% done'
         percentage = int(float(self._current) / float(self._total) * 100.0)
         done = int(percentage / 2)
-        return '[{0: <50}] {1}%'.format(done * '#', percentage)
+        return '[{0: <50}] {1}%'.format(_PROGRESS_BAR[:done], percentage)
 
     def calc_speed(self):
         dif = self._now - self._start
@@ -284,6 +333,16 @@ class DownloadProgress(object):
 
     def report_progress(self):
         """Report download progress."""
+        if self._quiet:
+            return
+
+        # Writing to the terminal for every chunk is needlessly slow on
+        # fast connections, so intermediate updates are rate-limited
+        if (not self._finished and self._last_report is not None and
+                self._now - self._last_report < self.report_interval):
+            return
+        self._last_report = self._now
+
         percent = self.calc_percent()
         total = format_bytes(self._total)
 
@@ -306,8 +365,12 @@ class NativeDownloader(Downloader):
     :param session: Requests session.
     """
 
-    def __init__(self, session):
+    # Files smaller than this are always downloaded over one connection
+    min_segmented_size = 4 * 1048576
+
+    def __init__(self, session, connections=1):
         self.session = session
+        self.connections = connections
 
     def _start_download(self, url, filename, resume=False):
         # resume has no meaning if the file doesn't exists!
@@ -321,12 +384,23 @@ class NativeDownloader(Downloader):
             logging.info('Resume downloading %s -> %s', url, filename)
         else:
             logging.info('Downloading %s -> %s', url, filename)
-
-        max_attempts = 3
+            if (self.connections > 1 and
+                    self._segmented_download(url, filename)):
+                return True
+
+        # Connection errors and 5xx/429 replies have already been retried
+        # with backoff by the session's adapter (see get_session), so only
+        # a connection lost while reading the body is retried here
+        max_attempts = len(WAIT_INTERVALS)
         attempts_count = 0
         error_msg = ''
         while attempts_count < max_attempts:
-            r = self.session.get(url, stream=True, headers=headers)
+            try:
+                r = self.session.get(url, stream=True, headers=headers)
+            except requests.exceptions.RequestException as e:
+                error_msg = str(e)
+                logging.warn('Error connecting to %s: %s', url, e)
+                break
 
             if r.status_code != 200:
                 # because in resume state we are downloading only a
@@ -344,19 +418,13 @@ class NativeDownloader(Downloader):
                 else:
                     print('%s %s %s' % (r.status_code, url, filesize))
                     logging.warn('Probably the file is missing from the AWS '
-                                 'repository...  waiting.')
+                                 'repository...')
 
                     if r.reason:
                         error_msg = r.reason + ' ' + str(r.status_code)
                     else:
                         error_msg = 'HTTP Error ' + str(r.status_code)
-
-                    wait_interval = 2 ** (attempts_count + 1)
-                    msg = 'Error downloading, will retry in {0} seconds ...'
-                    print(msg.format(wait_interval))
-                    time.sleep(wait_interval)
-                    attempts_count += 1
-                    continue
+                    break
 
             if resume and r.status_code == 200:
                 # if the server returns HTTP code 200 while we are in
@@ -364,26 +432,209 @@ class NativeDownloader(Downloader):
                 # partial downloads.
                 resume = False
 
-            content_length = r.headers.get('content-length')
-            chunk_sz = 1048576
-            progress = DownloadProgress(content_length)
-            progress.start()
-            f = open(filename, 'ab') if resume else open(filename, 'wb')
+            # Byte ranges refer to the encoded body, while the file
+            # holds the decoded one
+            encoded = r.headers.get('content-encoding',
+                                    'identity') != 'identity'
+            try:
+                self._save_response(r, filename, resume)
+                return True
+            except (requests.exceptions.RequestException,
+                    Urllib3HTTPError) as e:
+                error_msg = str(e)
+                logging.warn('Connection lost while downloading %s: %s',
+                             url, e)
+            finally:
+                r.close()
+
+            # Ask only for the missing tail of the file on the next
+            # attempt instead of starting over, unless the body was
+            # compressed
+            if not encoded and os.path.exists(filename):
+                resume = True
+                filesize = os.path.getsize(filename)
+                headers['Range'] = 'bytes={}-'.format(filesize)
+            else:
+                resume = False
+                filesize = None
+                headers.pop('Range', None)
+
+            if attempts_count + 1 == max_attempts:
+                break
+
+            # Add up to one second of jitter, so that parallel downloads
+            # failing at the same time do not all retry at the same time
+            wait_interval = WAIT_INTERVALS[attempts_count] + random.random()
+            msg = 'Error downloading, will retry in {0:.1f} seconds ...'
+            print(msg.format(wait_interval))
+            time.sleep(wait_interval)
+            attempts_count += 1
+
+        logging.warn('Skipping, can\'t download file ...')
+        logging.error(error_msg)
+        return False
+
+    def _get_segments(self, url):
+        """
+        Split the file into one byte range per connection.
+
+        @return: List of (start, end) byte ranges (both inclusive), or None
+            if the server does not support ranges or the file is too small
+            to be worth splitting.
+        @rtype: [(int, int)]
+        """
+        try:
+            r = self.session.get(url, stream=True,
+                                 headers={'Range': 'bytes=0-0'})
+        except requests.exceptions.RequestException:
+            return None
+        r.close()
+
+        # Ranges of a compressed body cannot be decoded separately
+        if r.status_code != 206 or r.headers.get('content-encoding'):
+            return None
+        match = re.match(r'bytes 0-0/(\d+)$',
+                         r.headers.get('content-range', ''))
+        if match is None:
+            return None
+
+        size = int(match.group(1))
+        if size < self.min_segmented_size:
+            return None
+
+        segment_size = -(-size // self.connections)
+        return [(start, min(start + segment_size, size) - 1)
+                for start in range(0, size, segment_size)]
+
+    def _segmented_download(self, url, filename):
+        """
+        Download the file over several connections at once, each of them
+        fetching a different byte range, like axel or aria2 do.
+
+        @return: True if the file was downloaded, False if it should be
+            downloaded over a single connection instead.
+        @rtype: bool
+        """
+        segments = self._get_segments(url)
+        if segments is None:
+            return False
+
+        size = segments[-1][1] + 1
+
+        # The segments are written into a preallocated file, which is only
+        # complete once all of them have been downloaded. Keep it under a
+        # temporary name until then, so that an interrupted download is
+        # never taken for a complete one by --resume
+        part_filename = filename + '.part'
+        with open(part_filename, 'wb') as f:
+            f.truncate(size)
+
+        chunk_sz = 1048576
+        progress = DownloadProgress(size)
+        progress_lock = threading.Lock()
+        cancelled = threading.Event()
+        progress.start()
+
+        def download_segment(segment):
+            start, end = segment
+            headers = {'Range': 'bytes={0}-{1}'.format(start, end)}
+            written = 0
+            try:
+                r = self.session.get(url, stream=True, headers=headers)
+                try:
+                    if r.status_code != 206:
+                        return False
+                    with open(part_filename, 'r+b') as f:
+                        f.seek(start)
+                        while not cancelled.is_set():
+                            data = r.raw.read(chunk_sz)
+                            if not data:
+                                break
+                            f.write(data)
+                            written += len(data)
+                            with progress_lock:
+                                progress.read(len(data))
+                finally:
+                    r.close()
+            except (requests.exceptions.RequestException,
+                    Urllib3HTTPError) as e:
+                logging.warn('Error downloading bytes %d-%d of %s: %s',
+                             start, end, url, e)
+                return False
+            return written == end - start + 1
+
+        completed = False
+        pool = Pool(len(segments))
+        try:
+            try:
+                results = pool.map(download_segment, segments)
+            except BaseException:
+                # Do not wait for the other segments, e.g. on Ctrl-C
+                cancelled.set()
+                pool.terminate()
+                raise
+            pool.close()
+            pool.join()
+
+            if not all(results):
+                logging.warn('Segmented download of %s failed, downloading '
+                             'over a single connection', url)
+                return False
+
+            if os.path.exists(filename):
+                os.remove(filename)
+            os.rename(part_filename, filename)
+            completed = True
+        finally:
+            progress.stop()
+            if not completed:
+                try:
+                    os.remove(part_filename)
+                except OSError:
+                    pass
+
+        return True
+
+    def _save_response(self, r, filename, resume):
+        """
+        Write the body of a streamed response to the given file.
+
+        @param r: Streamed response.
+        @type r: requests.Response
+
+        @param filename: Path of the file to write to.
+        @type filename: str
+
+        @param resume: Whether to append to the file instead of
+            overwriting it.
+        @type resume: bool
+        """
+        content_length = r.headers.get('content-length')
+        # Videos and documents are served as is, so the decoder only
+        # needs to run when the server actually compressed the body
+        decode_content = r.headers.get('content-encoding',
+                                       'identity') != 'identity'
+        chunk_sz = 1048576
+        progress = DownloadProgress(content_length)
+        progress.start()
+        with open(filename, 'ab' if resume else 'wb') as f:
             while True:
-                data = r.raw.read(chunk_sz, decode_content=True)
+                data = r.raw.read(chunk_sz, decode_content=decode_content)
                 if not data:
                     progress.stop()
                     break
-                progress.report(r.raw.tell())
+                progress.read(len(data))
                 f.write(data)
-            f.close()
-            r.close()
-            return True
 
-        if attempts_count == max_attempts:
-            logging.warn('Skipping, can\'t download file ...')
-            logging.error(error_msg)
-            return False
+
+# External downloaders by command-line option, in order of precedence when
+# several options are given
+EXTERNAL_DOWNLOADERS = (
+    ('wget', WgetDownloader),
+    ('curl', CurlDownloader),
+    ('aria2', Aria2Downloader),
+    ('axel', AxelDownloader),
+)
 
 
 def get_downloader(session, class_name, args):
@@ -391,16 +642,9 @@ def get_downloader(session, class_name, args):
     Decides which downloader to use.
     """
 
-    external = {
-        'wget': WgetDownloader,
-        'curl': CurlDownloader,
-        'aria2': Aria2Downloader,
-        'axel': AxelDownloader,
-    }
-
-    for bin, class_ in iteritems(external):
+    for bin, class_ in EXTERNAL_DOWNLOADERS:
         if getattr(args, bin):
             return class_(session, bin=getattr(args, bin),
                           downloader_arguments=args.downloader_arguments)
 
-    return NativeDownloader(session)
+    return NativeDownloader(session, connections=args.connections)
@@ -6,14 +6,16 @@ to parse course syllabus.
 """
 
 import abc
-import json
 import logging
 
+from functools import partial
+from multiprocessing.dummy import Pool
+
 from .api import (CourseraOnDemand, OnDemandCourseMaterialItemsV1,
                   ModulesV1, LessonsV1, ItemsV2)
 from .define import OPENCOURSE_ONDEMAND_COURSE_MATERIALS_V2
-from .network import get_page
-from .utils import is_debug_run, spit_json
+from .network import get_page_content
+from .utils import is_debug_run, loads_json, spit_json
 
 
 class PlatformExtractor(object):
@@ -47,14 +49,18 @@ class CourseraExtractor(PlatformExtractor):
                     reverse=False, unrestricted_filenames=False,
                     subtitle_language='en', video_resolution=None,
                     download_quizzes=False, mathjax_cdn_url=None,
-                    download_notebooks=False):
+                    download_notebooks=False, jobs=1):
+
+        # The extractor may be reused for several classes, and notebooks
+        # have to be downloaded once per class
+        self._notebook_downloaded = False
 
         page = self._get_on_demand_syllabus(class_name)
         error_occurred, modules = self._parse_on_demand_syllabus(
             class_name,
             page, reverse, unrestricted_filenames,
             subtitle_language, video_resolution,
-            download_quizzes, mathjax_cdn_url, download_notebooks)
+            download_quizzes, mathjax_cdn_url, download_notebooks, jobs)
 
         return error_occurred, modules
 
@@ -65,7 +71,7 @@ class CourseraExtractor(PlatformExtractor):
 
         url = OPENCOURSE_ONDEMAND_COURSE_MATERIALS_V2.format(
             class_name=class_name)
-        page = get_page(self._session, url)
+        page = get_page_content(self._session, url)
         logging.debug('Downloaded %s (%d bytes)', url, len(page))
 
         return page
@@ -76,8 +82,8 @@ class CourseraExtractor(PlatformExtractor):
                                   video_resolution=None,
                                   download_quizzes=False,
                                   mathjax_cdn_url=None,
-                                  download_notebooks=False
-                                  ):
+                                  download_notebooks=False,
+                                  jobs=1):
         """
         Parse a Coursera on-demand course listing/syllabus page.
 
@@ -87,7 +93,7 @@ class CourseraExtractor(PlatformExtractor):
         @rtype: (bool, list)
         """
 
-        dom = json.loads(page)
+        dom = loads_json(page)
         class_id = dom['elements'][0]['id']
 
         logging.info('Parsing syllabus of on-demand course (id=%s). '
@@ -106,7 +112,10 @@ class CourseraExtractor(PlatformExtractor):
             session=self._session, course_name=course_name)
 
         if is_debug_run():
-            spit_json(dom, '%s-syllabus-raw.json' % course_name)
+            # The page is dumped as it was received, there is no need to
+            # serialize the parsed syllabus again
+            with open('%s-syllabus-raw.json' % course_name, 'wb') as file_object:
+                file_object.write(page)
             spit_json(json_modules, '%s-material-items-v2.json' % course_name)
             spit_json(ondemand_material_items._items,
                       '%s-course-material-items.json' % course_name)
@@ -120,9 +129,17 @@ class CourseraExtractor(PlatformExtractor):
         all_items = ItemsV2.from_json(
             dom['linked']['onDemandCourseMaterialItems.v2'])
 
+        links_extractors = self._get_links_extractors(
+            course, class_id, subtitle_language, video_resolution,
+            download_quizzes, download_notebooks)
+
+        # Decide what has to be extracted for each lecture first, so that
+        # the extraction requests (one or more per lecture) can be run
+        # in parallel
+        syllabus = []
         for module in all_modules:
             logging.info('Processing module  %s', module.slug)
-            lessons = []
+            sections = []
             for section in module.children(all_lessons):
                 logging.info('Processing section     %s', section.slug)
                 lectures = []
@@ -137,77 +154,41 @@ class CourseraExtractor(PlatformExtractor):
                         available_lectures = [lecture]
 
                 for lecture in available_lectures:
-                    typename = lecture.type_name
-
-                    logging.info('Processing lecture         %s (%s)',
-                                 lecture.slug, typename)
+                    logging.debug('Processing lecture         %s (%s)',
+                                  lecture.slug, lecture.type_name)
+                    extract_links = self._get_links_extractor(
+                        links_extractors, lecture)
+                    if extract_links is not None:
+                        lectures.append((lecture.slug, extract_links))
+
+                sections.append((section.slug, lectures))
+            syllabus.append((module.slug, sections))
+
+        all_links = iter(self._run_links_extractors(
+            [extract_links
+             for _, sections in syllabus
+             for _, lectures in sections
+             for _, extract_links in lectures],
+            jobs))
+
+        for module_slug, sections in syllabus:
+            lessons = []
+            for section_slug, lectures in sections:
+                lecture_links = []
+                for lecture_slug, _ in lectures:
                     # Empty dictionary means there were no data
                     # None means an error occurred
-                    links = {}
-
-                    if typename == 'lecture':
-                        # lecture_video_id = lecture['content']['definition']['videoId']
-                        # assets = lecture['content']['definition'].get(
-                        #     'assets', [])
-                        lecture_video_id = lecture.id
-                        # assets = []
-
-                        links = course.extract_links_from_lecture(
-                            class_id,
-                            lecture_video_id, subtitle_language,
-                            video_resolution)
-
-                    elif typename == 'supplement':
-                        links = course.extract_links_from_supplement(
-                            lecture.id)
-
-                    elif typename == 'phasedPeer':
-                        links = course.extract_links_from_peer_assignment(
-                            lecture.id)
-
-                    elif typename in ('gradedProgramming', 'ungradedProgramming'):
-                        links = course.extract_links_from_programming(
-                            lecture.id)
-
-                    elif typename == 'quiz':
-                        if download_quizzes:
-                            links = course.extract_links_from_quiz(
-                                lecture.id)
-
-                    elif typename == 'exam':
-                        if download_quizzes:
-                            links = course.extract_links_from_exam(
-                                lecture.id)
-
-                    elif typename == 'programming':
-                        if download_quizzes:
-                            links = course.extract_links_from_programming_immediate_instructions(
-                                lecture.id)
-
-                    elif typename == 'notebook':
-                        if download_notebooks and not self._notebook_downloaded:
-                            logging.warning(
-                                'According to notebooks platform, content will be downloaded first')
-                            links = course.extract_links_from_notebook(
-                                lecture.id)
-                            self._notebook_downloaded = True
-
-                    else:
-                        logging.info(
-                            'Unsupported typename "%s" in lecture "%s" (lecture id "%s")',
-                            typename, lecture.slug, lecture.id)
-                        continue
-
+                    links = next(all_links)
                     if links is None:
                         error_occurred = True
                     elif links:
-                        lectures.append((lecture.slug, links))
+                        lecture_links.append((lecture_slug, links))
 
-                if lectures:
-                    lessons.append((section.slug, lectures))
+                if lecture_links:
+                    lessons.append((section_slug, lecture_links))
 
             if lessons:
-                modules.append((module.slug, lessons))
+                modules.append((module_slug, lessons))
 
         if modules and reverse:
             modules.reverse()
@@ -237,3 +218,91 @@ class CourseraExtractor(PlatformExtractor):
             modules.append(("Resources", references))
 
         return error_occurred, modules
+
+    def _get_links_extractors(self, course, class_id,
+                              subtitle_language, video_resolution,
+                              download_quizzes, download_notebooks):
+        """
+        Map the supported lecture type names to the functions that extract
+        the links of such lectures.
+
+        @return: Dictionary of functions that take the lecture id. Types
+            that are supported but not requested map to None.
+        @rtype: dict
+        """
+        extract_links_from_lecture = partial(
+            course.extract_links_from_lecture, class_id,
+            subtitle_language=subtitle_language,
+            resolution=video_resolution)
+
+        links_extractors = {
+            'lecture': extract_links_from_lecture,
+            'supplement': course.extract_links_from_supplement,
+            'phasedPeer': course.extract_links_from_peer_assignment,
+            'gradedProgramming': course.extract_links_from_programming,
+            'ungradedProgramming': course.extract_links_from_programming,
+            'quiz': None,
+            'exam': None,
+            'programming': None,
+            'notebook': None,
+        }
+
+        if download_quizzes:
+            links_extractors.update({
+                'quiz': course.extract_links_from_quiz,
+                'exam': course.extract_links_from_exam,
+                'programming':
+                    course.extract_links_from_programming_immediate_instructions,
+            })
+
+        if download_notebooks:
+            links_extractors['notebook'] = course.extract_links_from_notebook
+
+        return links_extractors
+
+    def _get_links_extractor(self, links_extractors, lecture):
+        """
+        Return a function that extracts the links of the given lecture.
+
+        @return: Function without arguments that returns the links of the
+            lecture (None if an error occurred), or None if there is
+            nothing to extract for this lecture.
+        @rtype: function
+        """
+        typename = lecture.type_name
+
+        if typename not in links_extractors:
+            logging.info(
+                'Unsupported typename "%s" in lecture "%s" (lecture id "%s")',
+                typename, lecture.slug, lecture.id)
+            return None
+
+        extract_links = links_extractors[typename]
+        if extract_links is None:
+            return None
+
+        if typename == 'notebook':
+            if self._notebook_downloaded:
+                return None
+            logging.warning(
+                'According to notebooks platform, content will be downloaded first')
+            self._notebook_downloaded = True
+
+        return partial(extract_links, lecture.id)
+
+    def _run_links_extractors(self, extractors, jobs=1):
+        """
+        Call the given links extractors, using up to `jobs` threads.
+
+        @return: List of the extractors' results, in the same order.
+        @rtype: list
+        """
+        if jobs < 2 or len(extractors) < 2:
+            return [extract_links() for extract_links in extractors]
+
+        pool = Pool(processes=min(jobs, len(extractors)))
+        try:
+            return pool.map(lambda extract_links: extract_links(), extractors)
+        finally:
+            pool.close()
+            pool.join()
@@ -10,29 +10,32 @@ from six.moves.urllib_parse import urlparse
 
 
 # These formats are trusted and are not skipped
-VALID_FORMATS = r"""^mp4$|
-                    ^pdf$|
-                    ^.?.?\.?txt$|
-                    ^.?.?\.?srt$|
-                    .*txt$|
-                    .*srt$|
-                    ^html?$|
-                    ^zip$|
-                    ^rar$|
-                    ^[ct]sv$|
-                    ^xlsx$|
-                    ^ipynb$|
-                    ^json$|
-                    ^pptx?$|
-                    ^docx?$|
-                    ^xls$|
-                    ^py$|
-                    ^Rmd$|
-                    ^Rdata$|
-                    ^wf1$"""
+VALID_FORMATS = r"""^(?:mp4|
+                       pdf|
+                       html?|
+                       zip|
+                       rar|
+                       [ct]sv|
+                       xlsx|
+                       ipynb|
+                       json|
+                       pptx?|
+                       docx?|
+                       xls|
+                       py|
+                       Rmd|
+                       Rdata|
+                       wf1|
+                       .*(?:txt|srt))$"""
+
+# Plain formats from VALID_FORMATS, looked up before trying the regex
+TRUSTED_FORMATS = frozenset([
+    'mp4', 'pdf', 'txt', 'srt', 'html', 'htm', 'zip', 'rar', 'csv', 'tsv',
+    'xlsx', 'ipynb', 'json', 'ppt', 'pptx', 'doc', 'docx', 'xls', 'py',
+    'Rmd', 'Rdata', 'wf1'])
 
 # Non simple format contains characters besides letters, numbers, "_" and "-"
-NON_SIMPLE_FORMAT = r".*[^a-zA-Z0-9_-]"
+NON_SIMPLE_FORMAT = r"[^a-zA-Z0-9_-]"
 
 RE_VALID_FORMATS = re.compile(VALID_FORMATS, re.VERBOSE)
 RE_NON_SIMPLE_FORMAT = re.compile(NON_SIMPLE_FORMAT)
@@ -59,22 +62,22 @@ def skip_format_url(format_, url):
     if ('mailto:' in url) and ('@' in url):
         return True
 
-    # Is this localhost?
-    parsed = urlparse(url)
-    if parsed.hostname == 'localhost':
+    # Is this localhost? Host names are case-insensitive, so the URL only
+    # has to be parsed if it mentions localhost in any case
+    if 'localhost' in url.lower() and urlparse(url).hostname == 'localhost':
         return True
 
     # These are trusted manually added formats, do not skip them
-    if RE_VALID_FORMATS.match(format_):
+    if format_ in TRUSTED_FORMATS or RE_VALID_FORMATS.match(format_):
         return False
 
     # Simple formats only contain letters, numbers, "_" and "-"
     # If this a non simple format?
-    if RE_NON_SIMPLE_FORMAT.match(format_):
+    if RE_NON_SIMPLE_FORMAT.search(format_):
         return True
 
     # Is this a link to the site root?
-    if parsed.path in ('', '/'):
+    if urlparse(url).path in ('', '/'):
         return True
 
     # Do not skip
@@ -93,6 +96,9 @@ def find_resources_to_get(lecture, file_formats, resource_filter, ignored_format
     if len(ignored_formats):
         logging.info("The following file formats will be ignored: " + ",".join(ignored_formats))
 
+    get_all_formats = 'all' in file_formats
+    search_filter = re.compile(resource_filter).search if resource_filter else None
+
     for fmt, resources in iteritems(lecture):
         fmt0 = fmt
 
@@ -103,9 +109,9 @@ def find_resources_to_get(lecture, file_formats, resource_filter, ignored_format
         if fmt in ignored_formats or (short_fmt != None and short_fmt in ignored_formats) :
             continue
 
-        if fmt in file_formats or (short_fmt != None and short_fmt in file_formats) or 'all' in file_formats:
+        if fmt in file_formats or (short_fmt != None and short_fmt in file_formats) or get_all_formats:
             for r in resources:
-                if resource_filter and r[1] and not re.search(resource_filter, r[1]):
+                if search_filter and r[1] and not search_filter(r[1]):
                     logging.debug('Skipping b/c of rf: %s %s',
                                   resource_filter, r[1])
                     continue
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+"""
+This module contains a cache of HTTP responses. Pages that were served
+with an ETag or Last-Modified header are stored together with these
+validators, so that the next request for the same URL can be sent as a
+conditional request and answered by the server with a bodiless
+"304 Not Modified".
+"""
+
+import hashlib
+import logging
+import os
+import threading
+
+from collections import OrderedDict, namedtuple
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+from requests.utils import get_encoding_from_headers
+
+from .cookies import TLSAdapter
+from .utils import mkdir_p
+
+
+# Name of the database file inside of the cache directory
+HTTP_CACHE_FILENAME = 'http-cache.sqlite'
+
+# Number of entries kept in memory
+HTTP_CACHE_MEMORY_SIZE = 512
+
+# Only API replies and pages are cached, not the (possibly large) files
+# that are fetched without streaming, such as assets and notebook data
+HTTP_CACHE_CONTENT_TYPES = ('application/json', 'text/html', 'text/plain')
+
+# Larger responses are not cached
+HTTP_CACHE_MAX_BODY_SIZE = 16 * 1048576
+
+
+CacheEntry = namedtuple('CacheEntry',
+                        'etag last_modified content_type body')
+
+
+class HTTPCache(object):
+    """
+    Cache of HTTP responses keyed by URL.
+
+    The most recently used entries are kept in memory. If a filename is
+    given (and sqlite3 is available), all entries are also stored in an
+    sqlite database, so that later runs can reuse them.
+
+    The cache is only used to build conditional requests, so whether a
+    stored body may be reused is always decided by the server. This
+    makes it safe to key the entries by URL only, even though the
+    responses depend on the logged in user: another user gets another
+    representation, and with it another validator.
+    """
+
+    def __init__(self, filename=None, maxsize=HTTP_CACHE_MEMORY_SIZE):
+        """
+        @param filename: Path to the database file. If None, entries are
+            only kept in memory.
+        @type filename: str
+
+        @param maxsize: Number of entries kept in memory.
+        @type maxsize: int
+        """
+        self._maxsize = maxsize
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if filename is not None:
+            if sqlite3 is None:
+                logging.warning('sqlite3 is not available, HTTP responses '
+                                'will only be cached in memory')
+            else:
+                mkdir_p(os.path.dirname(filename), 0o700)
+                self._db = sqlite3.connect(filename, check_same_thread=False)
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS responses ('
+                    'key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, '
+                    'content_type TEXT, body BLOB)')
+                self._db.commit()
+
+    @staticmethod
+    def _make_key(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        while len(self._memory) > self._maxsize:
+            self._memory.popitem(last=False)
+
+    def get(self, url):
+        """
+        Look up the cached response for the URL.
+
+        @param url: URL of the page.
+        @type url: str
+
+        @return: Cached entry or None if the URL is not cached.
+        @rtype: CacheEntry
+        """
+        key = self._make_key(url)
+        with self._lock:
+            entry = self._memory.pop(key, None)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    'SELECT etag, last_modified, content_type, body '
+                    'FROM responses WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    entry = CacheEntry(row[0], row[1], row[2], bytes(row[3]))
+            if entry is not None:
+                self._remember(key, entry)
+            return entry
+
+    def set(self, url, entry):
+        """
+        Store the response for the URL.
+
+        @param url: URL of the page.
+        @type url: str
+
+        @param entry: Validators and body of the response.
+        @type entry: CacheEntry
+        """
+        key = self._make_key(url)
+        with self._lock:
+            self._memory.pop(key, None)
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO responses '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, entry.etag, entry.last_modified,
+                     entry.content_type, sqlite3.Binary(entry.body)))
+                self._db.commit()
+
+    def close(self):
+        """
+        Close the database file.
+        """
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class CachingTLSAdapter(TLSAdapter):
+    """
+    TLS adapter that sends conditional GET requests for pages stored in
+    an HTTPCache and serves the stored body when the server replies with
+    "304 Not Modified".
+
+    Streamed requests (i.e. file downloads) bypass the cache.
+    """
+
+    def __init__(self, cache, *args, **kwargs):
+        self._cache = cache
+        super(CachingTLSAdapter, self).__init__(*args, **kwargs)
+
+    @staticmethod
+    def _is_cacheable(response):
+        content_type = response.headers.get('Content-Type', '')
+        content_type = content_type.split(';')[0].strip().lower()
+        return (content_type in HTTP_CACHE_CONTENT_TYPES and
+                len(response.content) <= HTTP_CACHE_MAX_BODY_SIZE)
+
+    def send(self, request, stream=False, **kwargs):
+        if (request.method != 'GET' or stream or
+                'If-None-Match' in request.headers or
+                'If-Modified-Since' in request.headers):
+            return super(CachingTLSAdapter, self).send(
+                request, stream=stream, **kwargs)
+
+        entry = self._cache.get(request.url)
+        if entry is not None:
+            if entry.etag:
+                request.headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                request.headers['If-Modified-Since'] = entry.last_modified
+
+        response = super(CachingTLSAdapter, self).send(
+            request, stream=stream, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            logging.debug('Page %s not modified, using cached copy',
+                          request.url)
+            response.status_code = 200
+            response.reason = 'OK'
+            response._content = entry.body
+            response._content_consumed = True
+            if entry.content_type:
+                response.headers['Content-Type'] = entry.content_type
+            response.encoding = get_encoding_from_headers(response.headers)
+
+        elif response.status_code == 200 and self._is_cacheable(response):
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified:
+                self._cache.set(request.url, CacheEntry(
+                    etag, last_modified,
+                    response.headers.get('Content-Type'),
+                    response.content))
+
+        return response
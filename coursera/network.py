@@ -3,11 +3,12 @@ This module contains utility functions that operate on the network, download
 some data and so on.
 """
 
-import json
 import logging
 
 import requests
 
+from .utils import loads_json
+
 
 def get_reply(session, url, post=False, data=None, headers=None, quiet=False):
     """
@@ -37,15 +38,12 @@ def get_reply(session, url, post=False, data=None, headers=None, quiet=False):
     @rtype: requests.Response
     """
 
-    request_headers = {} if headers is None else headers
-
-    request = requests.Request('POST' if post else 'GET',
-                               url,
-                               data=data,
-                               headers=request_headers)
-    prepared_request = session.prepare_request(request)
-
-    reply = session.send(prepared_request)
+    # Session.request also applies the environment settings (proxies,
+    # CA bundle) that a bare Session.send would ignore
+    reply = session.request('POST' if post else 'GET',
+                            url,
+                            data=data,
+                            headers=headers)
 
     try:
         reply.raise_for_status()
@@ -72,7 +70,8 @@ def get_page(session,
     @param session: Requests session.
     @type session: requests.Session
 
-    @param url: URL pattern with optional keywords to format.
+    @param url: URL pattern with optional keywords to format. The URL is
+        used as is when no keywords are given.
     @type url: str
 
     @param post: Flag that indicates whether POST request should be sent.
@@ -87,10 +86,31 @@ def get_page(session,
     @return: Response body.
     @rtype: str
     """
-    url = url.format(**kwargs)
+    if kwargs:
+        url = url.format(**kwargs)
     reply = get_reply(session, url, post=post, data=data, headers=headers,
                       quiet=quiet)
-    return reply.json() if json else reply.text
+    return loads_json(reply.content) if json else reply.text
+
+
+def get_page_content(session, url, **kwargs):
+    """
+    Download a page using the requests session and return its body as
+    bytes. Unlike get_page, the body is not decoded to text, which is
+    useless work for documents that are going to be parsed as JSON.
+
+    @param session: Requests session.
+    @type session: requests.Session
+
+    @param url: URL pattern with optional keywords to format.
+    @type url: str
+
+    @return: Response body.
+    @rtype: bytes
+    """
+    if kwargs:
+        url = url.format(**kwargs)
+    return get_reply(session, url).content
 
 
 def get_page_and_url(session, url):
@@ -103,6 +123,7 @@ def get_page_and_url(session, url):
 
 
 def post_page_and_reply(session, url, data=None, headers=None, **kwargs):
-    url = url.format(**kwargs)
+    if kwargs:
+        url = url.format(**kwargs)
     reply = get_reply(session, url, post=True, data=data, headers=headers)
     return reply.text, reply
@@ -111,6 +111,22 @@ def test_prepare_cookies_does_nothing():
     assert command == []
 
 
+def test_prepare_cookies_is_updated_when_cookies_change():
+    s = _ext_get_session()
+
+    d = downloaders.ExternalDownloader(s, bin="test")
+    d._add_cookies = lambda cmd, cv: cmd.append(cv)
+
+    command = []
+    d._prepare_cookies(command, 'http://www.coursera.org/a.mp4')
+    d._prepare_cookies(command, 'http://www.coursera.org/b.mp4')
+    assert command[0] == command[1]
+
+    s.cookies.set('CAUTH', 'cauth', domain="www.coursera.org")
+    d._prepare_cookies(command, 'http://www.coursera.org/c.mp4')
+    assert 'CAUTH=cauth' in command[2]
+
+
 def test_start_command_raises_exception():
     d = downloaders.ExternalDownloader(None, bin='test')
     d._add_cookies = lambda cmd, cookie_values: None
@@ -179,6 +195,21 @@ def test_axel():
     assert any("session=sessionclass1" in e for e in command)
 
 
+@pytest.mark.parametrize(
+    "argv,class_", [
+        ([], downloaders.NativeDownloader),
+        (['--aria2'], downloaders.Aria2Downloader),
+        (['--axel', '--curl'], downloaders.CurlDownloader),
+        (['--aria2', '--wget'], downloaders.WgetDownloader),
+    ]
+)
+def test_get_downloader(argv, class_):
+    args = coursera_dl.parse_args(['-u', 'bob', '-p', 'bill', 'posa-001'] +
+                                  argv)
+    d = downloaders.get_downloader(_ext_get_session(), 'posa-001', args)
+    assert type(d) is class_
+
+
 # Native Downloader
 
 def test_all_attempts_have_failed():
@@ -205,6 +236,215 @@ def test_all_attempts_have_failed():
     time.sleep = _sleep
 
 
+class _MockRaw(object):
+    """
+    Raw response that returns the given chunks and raises the given
+    exception (if any) when they are exhausted.
+    """
+
+    def __init__(self, chunks, error=None):
+        self._chunks = list(chunks)
+        self._error = error
+        self._read = 0
+
+    def read(self, chunk_sz, decode_content=True):
+        if self._chunks:
+            data = self._chunks.pop(0)
+            self._read += len(data)
+            return data
+        if self._error is not None:
+            raise self._error
+        return b''
+
+    def tell(self):
+        return self._read
+
+
+class _MockResponse(object):
+
+    def __init__(self, status_code, raw):
+        self.status_code = status_code
+        self.reason = None
+        self.headers = {}
+        self.raw = raw
+
+    def close(self):
+        pass
+
+
+def test_resume_after_connection_lost(tmpdir, monkeypatch):
+    from urllib3.exceptions import ProtocolError
+
+    monkeypatch.setattr(downloaders.time, 'sleep', lambda interval: None)
+
+    responses = [
+        _MockResponse(200, _MockRaw([b'abc'], ProtocolError('lost'))),
+        _MockResponse(206, _MockRaw([b'def'])),
+    ]
+    requested_headers = []
+
+    class MockSession(object):
+
+        def get(self, url, stream=True, headers={}):
+            requested_headers.append(dict(headers))
+            return responses.pop(0)
+
+    filename = str(tmpdir.join('video.mp4'))
+    d = downloaders.NativeDownloader(MockSession())
+
+    assert d._start_download('download_url', filename, False) is True
+    assert requested_headers == [{}, {'Range': 'bytes=3-'}]
+    with open(filename, 'rb') as f:
+        assert f.read() == b'abcdef'
+
+
+def test_error_status_is_not_retried(tmpdir, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(downloaders.time, 'sleep', sleeps.append)
+    responses = [_MockResponse(503, _MockRaw([]))]
+
+    class MockSession(object):
+
+        def get(self, url, stream=True, headers={}):
+            return responses.pop(0)
+
+    filename = str(tmpdir.join('video.mp4'))
+    d = downloaders.NativeDownloader(MockSession())
+
+    assert d._start_download('download_url', filename, False) is False
+    assert responses == []
+    assert sleeps == []
+
+
+def test_restart_after_connection_lost_if_encoded(tmpdir, monkeypatch):
+    from urllib3.exceptions import ProtocolError
+
+    monkeypatch.setattr(downloaders.time, 'sleep', lambda interval: None)
+
+    responses = [
+        _MockResponse(200, _MockRaw([b'abc'], ProtocolError('lost'))),
+        _MockResponse(200, _MockRaw([b'abcdef'])),
+    ]
+    responses[0].headers['content-encoding'] = 'gzip'
+    requested_headers = []
+
+    class MockSession(object):
+
+        def get(self, url, stream=True, headers={}):
+            requested_headers.append(dict(headers))
+            return responses.pop(0)
+
+    filename = str(tmpdir.join('video.mp4'))
+    d = downloaders.NativeDownloader(MockSession())
+
+    assert d._start_download('download_url', filename, False) is True
+    assert requested_headers == [{}, {}]
+    with open(filename, 'rb') as f:
+        assert f.read() == b'abcdef'
+
+
+def test_segmented_download(tmpdir, monkeypatch):
+    import threading
+
+    content = b'0123456789'
+    requested_ranges = []
+    lock = threading.Lock()
+
+    class MockSession(object):
+
+        def get(self, url, stream=True, headers={}):
+            start, end = headers['Range'][len('bytes='):].split('-')
+            start, end = int(start), int(end)
+            with lock:
+                requested_ranges.append((start, end))
+            response = _MockResponse(206, _MockRaw([content[start:end + 1]]))
+            response.headers['content-range'] = 'bytes %d-%d/%d' % (
+                start, end, len(content))
+            return response
+
+    filename = str(tmpdir.join('video.mp4'))
+    d = downloaders.NativeDownloader(MockSession(), connections=3)
+    d.min_segmented_size = 0
+
+    assert d._start_download('download_url', filename, False) is True
+    assert sorted(requested_ranges) == [(0, 0), (0, 3), (4, 7), (8, 9)]
+    with open(filename, 'rb') as f:
+        assert f.read() == content
+
+
+def _segmented_session(content, error_at=None):
+
+    class MockSession(object):
+
+        def get(self, url, stream=True, headers={}):
+            start, end = headers['Range'][len('bytes='):].split('-')
+            start, end = int(start), int(end)
+            if start == error_at:
+                raise ValueError('interrupted')
+            response = _MockResponse(206, _MockRaw([content[start:end + 1]]))
+            response.headers['content-range'] = 'bytes %d-%d/%d' % (
+                start, end, len(content))
+            return response
+
+    return MockSession()
+
+
+def test_segmented_download_removes_partial_file_on_error(tmpdir):
+    filename = str(tmpdir.join('video.mp4'))
+    d = downloaders.NativeDownloader(
+        _segmented_session(b'0123456789', error_at=4), connections=3)
+    d.min_segmented_size = 0
+
+    with pytest.raises(ValueError):
+        d._segmented_download('download_url', filename)
+    assert tmpdir.listdir() == []
+
+
+def test_segmented_download_stops_on_keyboard_interrupt(tmpdir, monkeypatch):
+    terminated = []
+
+    class MockPool(object):
+
+        def __init__(self, processes):
+            pass
+
+        def map(self, func, iterable):
+            raise KeyboardInterrupt
+
+        def terminate(self):
+            terminated.append(True)
+
+    monkeypatch.setattr(downloaders, 'Pool', MockPool)
+    filename = str(tmpdir.join('video.mp4'))
+    d = downloaders.NativeDownloader(
+        _segmented_session(b'0123456789'), connections=3)
+    d.min_segmented_size = 0
+
+    with pytest.raises(KeyboardInterrupt):
+        d._segmented_download('download_url', filename)
+    assert terminated == [True]
+    assert tmpdir.listdir() == []
+
+
+def test_segmented_download_falls_back_without_range_support(tmpdir):
+    requested_headers = []
+
+    class MockSession(object):
+
+        def get(self, url, stream=True, headers={}):
+            requested_headers.append(dict(headers))
+            return _MockResponse(200, _MockRaw([b'abc']))
+
+    filename = str(tmpdir.join('video.mp4'))
+    d = downloaders.NativeDownloader(MockSession(), connections=3)
+    d.min_segmented_size = 0
+
+    assert d._start_download('download_url', filename, False) is True
+    assert requested_headers == [{'Range': 'bytes=0-0'}, {}]
+    with open(filename, 'rb') as f:
+        assert f.read() == b'abc'
+
+
 # Download Progress
 
 def _get_progress(total):
@@ -259,3 +499,45 @@ def test_calc_speed_ifread():
     p.read(2000)
     p._now = p._start + 1000
     assert p.calc_speed() == '2.00B/s'
+
+
+def test_report_progress_is_quiet_if_not_a_terminal(capsys):
+    p = downloaders.DownloadProgress(100)
+    p.start()
+    p.read(10)
+    p.stop()
+
+    assert capsys.readouterr().out == ''
+
+
+def test_report_progress_is_throttled(capsys):
+    p = downloaders.DownloadProgress(100)
+    p._quiet = False
+    p.start()
+
+    p.read(10)
+    p.read(10)
+    assert capsys.readouterr().out.count('\r') == 1
+
+    p._last_report -= p.report_interval
+    p.read(10)
+    assert capsys.readouterr().out.count('\r') == 1
+
+    p.stop()
+    assert capsys.readouterr().out.count('\r') == 1
+
+
+@pytest.mark.parametrize(
+    "bytes,formatted", [
+        (None, 'N/A'),
+        (0, '0.00B'),
+        (0.5, '0.50B'),
+        (1023, '1023.00B'),
+        (1024, '1.00KB'),
+        ('1536', '1.50KB'),
+        (1024 ** 2, '1.00MB'),
+        (5 * 1024 ** 3 - 1, '5.00GB'),
+    ]
+)
+def test_format_bytes(bytes, formatted):
+    assert downloaders.format_bytes(bytes) == formatted
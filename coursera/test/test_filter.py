@@ -1,4 +1,5 @@
-from coursera.filtering import skip_format_url
+from coursera.filtering import (skip_format_url, TRUSTED_FORMATS,
+                                RE_VALID_FORMATS)
 
 
 def test_filter():
@@ -27,3 +28,8 @@ def test_filter():
 
     for expected_result, fmt, url in test_cases:
         assert expected_result == skip_format_url(fmt, url)
+
+
+def test_trusted_formats_are_valid_formats():
+    for fmt in TRUSTED_FORMATS:
+        assert RE_VALID_FORMATS.match(fmt)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+Test the HTTP response cache.
+"""
+
+import pytest
+import requests
+
+from mock import patch
+from requests.adapters import HTTPAdapter
+
+from coursera import httpcache
+from coursera.httpcache import HTTPCache, CacheEntry, CachingTLSAdapter
+
+
+URL = 'https://api.coursera.org/api/onDemandCourses.v1?q=slug&slug=test'
+
+
+def make_response(status_code, content=b'', headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers or {})
+    return response
+
+
+def make_request(method='GET', headers=None):
+    return requests.Request(method, URL, headers=headers).prepare()
+
+
+def test_cache_evicts_least_recently_used_entry():
+    cache = HTTPCache(maxsize=2)
+    for i in range(3):
+        cache.set(URL + str(i), CacheEntry('"%d"' % i, None, None, b''))
+
+    assert cache.get(URL + '0') is None
+    assert cache.get(URL + '1').etag == '"1"'
+    assert cache.get(URL + '2').etag == '"2"'
+
+
+def test_cache_persists_entries(tmpdir):
+    filename = str(tmpdir.join('cache', 'http-cache.sqlite'))
+    entry = CacheEntry('"abc"', 'Mon, 01 Jan 2018 00:00:00 GMT',
+                       'application/json; charset=utf-8', b'{"a": 1}')
+
+    cache = HTTPCache(filename)
+    cache.set(URL, entry)
+    cache.close()
+
+    assert HTTPCache(filename).get(URL) == entry
+
+
+@patch.object(HTTPAdapter, 'send')
+def test_adapter_stores_responses_with_validators(send):
+    send.return_value = make_response(
+        200, b'{}', {'ETag': '"abc"', 'Content-Type': 'application/json'})
+    cache = HTTPCache()
+    adapter = CachingTLSAdapter(cache)
+
+    adapter.send(make_request())
+
+    assert cache.get(URL) == CacheEntry(
+        '"abc"', None, 'application/json', b'{}')
+
+
+@pytest.mark.parametrize(
+    "content_type,content", [
+        ('application/octet-stream', b'{}'),
+        ('image/png', b'\x89PNG'),
+        ('application/json', b'{"a": "aaaa"}'),
+    ]
+)
+@patch.object(HTTPAdapter, 'send')
+def test_adapter_skips_files_and_large_responses(send, monkeypatch,
+                                                 content_type, content):
+    monkeypatch.setattr(httpcache, 'HTTP_CACHE_MAX_BODY_SIZE', 8)
+    send.return_value = make_response(
+        200, content, {'ETag': '"abc"', 'Content-Type': content_type})
+    cache = HTTPCache()
+    adapter = CachingTLSAdapter(cache)
+
+    adapter.send(make_request())
+
+    assert cache.get(URL) is None
+
+
+@patch.object(HTTPAdapter, 'send')
+def test_adapter_uses_cached_body_if_not_modified(send):
+    send.return_value = make_response(304)
+    cache = HTTPCache()
+    cache.set(URL, CacheEntry('"abc"', None,
+                              'application/json; charset=utf-8', b'{}'))
+    adapter = CachingTLSAdapter(cache)
+
+    request = make_request()
+    response = adapter.send(request)
+
+    assert request.headers['If-None-Match'] == '"abc"'
+    assert response.status_code == 200
+    assert response.json() == {}
+    assert response.encoding == 'utf-8'
+
+
+@pytest.mark.parametrize(
+    "method,stream", [
+        ('POST', False),
+        ('GET', True),
+    ]
+)
+@patch.object(HTTPAdapter, 'send')
+def test_adapter_bypasses_cache(send, method, stream):
+    send.return_value = make_response(200, b'{}', {'ETag': '"abc"'})
+    cache = HTTPCache()
+    cache.set(URL, CacheEntry('"old"', None, None, b''))
+    adapter = CachingTLSAdapter(cache)
+
+    request = make_request(method)
+    adapter.send(request, stream=stream)
+
+    assert 'If-None-Match' not in request.headers
+    assert cache.get(URL).etag == '"old"'
@@ -14,6 +14,7 @@ from mock import patch, Mock, mock_open
 
 from coursera import coursera_dl
 from coursera import api
+from coursera import extractors
 from coursera.define import IN_MEMORY_EXTENSION, IN_MEMORY_MARKER
 
 
@@ -147,3 +148,41 @@ def test_get_on_demand_supplement_url_accumulates_assets(mocked):
     # This is the easiest way to convert nested tuples to lists
     output = json.loads(json.dumps(output))
     assert expected_output == output
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_run_links_extractors_preserves_order(jobs):
+    extractor = extractors.CourseraExtractor(session=None)
+    links = [{'mp4': [['url%d' % i, '']]} for i in range(10)]
+
+    output = extractor._run_links_extractors(
+        [lambda links=links: links for links in links], jobs)
+
+    assert links == output
+
+
+@pytest.mark.parametrize(
+    "typename,download_quizzes,method", [
+        ('lecture', False, 'extract_links_from_lecture'),
+        ('supplement', False, 'extract_links_from_supplement'),
+        ('ungradedProgramming', False, 'extract_links_from_programming'),
+        ('quiz', False, None),
+        ('quiz', True, 'extract_links_from_quiz'),
+        ('unknownType', True, None),
+    ]
+)
+def test_get_links_extractor(typename, download_quizzes, method):
+    extractor = extractors.CourseraExtractor(session=None)
+    course = Mock()
+    links_extractors = extractor._get_links_extractors(
+        course, 'class_id', 'en', '540p', download_quizzes, False)
+    lecture = api.ItemV2('name', 'lecture_id', 'slug', typename,
+                         'lesson_id', 'module_id')
+
+    extract_links = extractor._get_links_extractor(links_extractors, lecture)
+
+    if method is None:
+        assert extract_links is None
+    else:
+        extract_links()
+        assert getattr(course, method).call_count == 1
@@ -14,9 +14,11 @@ import requests
 import six
 
 from mock import Mock
+from urllib3.util import make_headers
 from coursera import utils
 from coursera import coursera_dl
 from coursera import api
+from coursera import network
 
 from coursera.test.utils import slurp_fixture
 from coursera.formatting import (format_section, format_resource,
@@ -171,6 +173,31 @@ def test_is_course_complete_should_give_true_if_there_was_no_recent_update():
     assert rv is True
 
 
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_spit_json_round_trip(tmpdir, monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(utils, 'orjson', None)
+    elif utils.orjson is None:
+        pytest.skip('orjson is not installed')
+
+    modules = [['module', [['section', [['lecture', {'mp4': [['url', '']]}]]]]]]
+    filename = str(tmpdir.join('syllabus.json'))
+
+    utils.spit_json(modules, filename)
+    assert utils.slurp_json(filename) == modules
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+@pytest.mark.parametrize("data", [u'{"a": ["\u00e9"]}', b'{"a": ["\xc3\xa9"]}'])
+def test_loads_json(monkeypatch, use_orjson, data):
+    if not use_orjson:
+        monkeypatch.setattr(utils, 'orjson', None)
+    elif utils.orjson is None:
+        pytest.skip('orjson is not installed')
+
+    assert utils.loads_json(data) == {'a': [u'\u00e9']}
+
+
 def test_correct_formatting_of_class_URL():
     pytest.skip()
 
@@ -194,13 +221,46 @@ def test_parse_args():
     assert args.password == 'bill'
 
 
+@pytest.mark.parametrize(
+    "version,expected", [
+        ('2.4', (2, 4)),
+        ('2.25.1', (2, 25)),
+        ('1.16.0', (1, 16)),
+        ('4.12.0rc1', (4, 12)),
+        ('10', (10,)),
+        ('dev', ()),
+    ]
+)
+def test_version_tuple(version, expected):
+    assert coursera_dl._version_tuple(version) == expected
+
+
+def test_syllabus_cache_filename_depends_on_options():
+    args = coursera_dl.parse_args(['-u', 'bob', '-p', 'bill', 'posa-001'])
+    filename = coursera_dl.get_syllabus_cache_filename(args, 'posa-001')
+
+    assert os.path.basename(filename).startswith('posa-001-')
+    assert filename == coursera_dl.get_syllabus_cache_filename(
+        args, 'posa-001')
+
+    args.subtitle_language = 'ru'
+    assert filename != coursera_dl.get_syllabus_cache_filename(
+        args, 'posa-001')
+
+
+def test_get_session_accepts_encodings_urllib3_can_decode():
+    session = coursera_dl.get_session()
+
+    assert (session.headers['Accept-Encoding'] ==
+            make_headers(accept_encoding=True)['accept-encoding'])
+
+
 def get_mock_session(page_text):
     page_obj = Mock()
     page_obj.text = page_text
     page_obj.raise_for_status = Mock()
     session = requests.Session()
-    session.send = Mock(return_value=page_obj)
-    session.prepare_request = Mock(return_value=None)
+    session.request = Mock(return_value=page_obj)
     return page_obj, session
 
 
@@ -209,11 +269,25 @@ def test_get_page():
 
     p = coursera_dl.get_page(session, 'http://www.not.here')
 
-    session.send.assert_called_once_with(None)
+    session.request.assert_called_once_with(
+        'GET', 'http://www.not.here', data=None, headers=None)
     page_obj.raise_for_status.assert_called_once_with()
     assert p == '<page/>'
 
 
+def test_get_page_content():
+    page_obj, session = get_mock_session('<page/>')
+    page_obj.content = b'<page/>'
+
+    p = network.get_page_content(session, 'http://www.not.here/{name}',
+                                 name='page')
+
+    session.request.assert_called_once_with(
+        'GET', 'http://www.not.here/page', data=None, headers=None)
+    page_obj.raise_for_status.assert_called_once_with()
+    assert p == b'<page/>'
+
+
 def test_grab_hidden_video_url():
     pytest.skip()
 
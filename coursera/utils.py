@@ -11,7 +11,6 @@ import time
 import json
 import errno
 import random
-import string
 import logging
 import datetime
 
@@ -41,10 +40,36 @@ else:
 
 from .define import COURSERA_URL, WINDOWS_UNC_PREFIX
 
-# Force us of bs4 with html.parser
-
-
-def BeautifulSoup(page): return BeautifulSoup_(page, 'html.parser')
+# orjson is optional, the json module is used when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# HTMLParser.unescape is deprecated since Python 3.4 and gone in 3.9
+try:
+    from html import unescape as html_unescape
+except ImportError:
+    html_unescape = html_parser.HTMLParser().unescape
+
+# lxml parses considerably faster than the pure-Python html.parser, but it
+# restructures Coursera's markup (unknown tags, self-closing <asset/> tags,
+# <html>/<body> wrappers), so it is only used where a page is searched
+# and never re-serialized.
+try:
+    import lxml  # noqa: F401
+    FAST_HTML_PARSER = 'lxml'
+except ImportError:  # pragma: no cover
+    FAST_HTML_PARSER = 'html.parser'
+
+
+def BeautifulSoup(page, features='html.parser'):
+    """
+    Parse page with bs4. html.parser is used by default because its
+    output is stable across platforms; pass features=FAST_HTML_PARSER
+    for read-only lookups.
+    """
+    return BeautifulSoup_(page, features)
 
 
 if six.PY2:
@@ -58,16 +83,47 @@ else:
         return x
 
 
+#: Write buffer used when dumping (potentially large) JSON files
+JSON_WRITE_BUFFER_SIZE = 1 << 20
+
+
 def spit_json(obj, filename):
-    with open(filename, 'w') as file_object:
-        json.dump(obj, file_object, indent=4)
+    """
+    Dump obj to filename as JSON. orjson is used if it is installed.
+    """
+    if orjson is not None:
+        with open(filename, 'wb',
+                  buffering=JSON_WRITE_BUFFER_SIZE) as file_object:
+            file_object.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(filename, 'w',
+                  buffering=JSON_WRITE_BUFFER_SIZE) as file_object:
+            json.dump(obj, file_object, indent=2, separators=(',', ':'))
 
 
 def slurp_json(filename):
+    """
+    Load JSON from filename. orjson is used if it is installed.
+    """
+    if orjson is not None:
+        with open(filename, 'rb') as file_object:
+            return orjson.loads(file_object.read())
     with open(filename) as file_object:
         return json.load(file_object)
 
 
+def loads_json(data):
+    """
+    Parse a JSON document given as str or bytes. orjson is used if it is
+    installed.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
 def is_debug_run():
     """
     Check whether we're running with DEBUG loglevel.
@@ -98,12 +154,19 @@ HTML_UNESCAPE_TABLE = dict((v, k) for k, v in HTML_ESCAPE_TABLE.items())
 
 
 def unescape_html(s):
-    h = html_parser.HTMLParser()
-    s = h.unescape(s)
+    s = html_unescape(s)
     s = unquote_plus(s)
     return unescape(s, HTML_UNESCAPE_TABLE)
 
 
+#: Characters that are forbidden in filenames on at least one platform
+#: https://msdn.microsoft.com/en-us/library/windows/desktop/aa365247(v=vs.85).aspx
+FORBIDDEN_FILENAME_CHARS_RE = re.compile(r'[:/<>"\\|?*\x00]')
+
+#: Characters that are removed by clean_filename when minimal_change is False
+INVALID_FILENAME_CHARS_RE = re.compile(r'[^-_.()a-zA-Z0-9]')
+
+
 def clean_filename(s, minimal_change=False):
     """
     Sanitize a string to be used as a filename.
@@ -114,25 +177,11 @@ def clean_filename(s, minimal_change=False):
     """
 
     # First, deal with URL encoded strings
-    h = html_parser.HTMLParser()
-    s = h.unescape(s)
+    s = html_unescape(s)
     s = unquote_plus(s)
 
     # Strip forbidden characters
-    # https://msdn.microsoft.com/en-us/library/windows/desktop/aa365247(v=vs.85).aspx
-    s = (
-        s.replace(':', '-')
-        .replace('/', '-')
-        .replace('<', '-')
-        .replace('>', '-')
-        .replace('"', '-')
-        .replace('\\', '-')
-        .replace('|', '-')
-        .replace('?', '-')
-        .replace('*', '-')
-        .replace('\x00', '-')
-        .replace('\n', ' ')
-    )
+    s = FORBIDDEN_FILENAME_CHARS_RE.sub('-', s).replace('\n', ' ')
 
     # Remove trailing dots and spaces; forbidden on Windows
     s = s.rstrip(' .')
@@ -144,8 +193,7 @@ def clean_filename(s, minimal_change=False):
     s = s.rstrip('.')  # Remove excess of trailing dots
 
     s = s.strip().replace(' ', '_')
-    valid_chars = '-_.()%s%s' % (string.ascii_letters, string.digits)
-    return ''.join(c for c in s if c in valid_chars)
+    return INVALID_FILENAME_CHARS_RE.sub('', s)
 
 
 def normalize_path(path):
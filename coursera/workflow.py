@@ -26,6 +26,7 @@ def _iter_modules(modules, class_name, path, ignored_formats, args):
     section_filter = args.section_filter
     verbose_dirs = args.verbose_dirs
     combined_section_lectures_nums = args.combined_section_lectures_nums
+    class_dir = os.path.join(path, class_name)
 
     class IterModule(object):
         def __init__(self, index, module):
@@ -49,7 +50,7 @@ def _iter_modules(modules, class_name, path, ignored_formats, args):
             self.index = secnum
             self.name = '%02d_%s' % (secnum, section)
             self.dir = os.path.join(
-                path, class_name, module_iter.name,
+                class_dir, module_iter.name,
                 format_section(secnum + 1, section,
                                class_name, verbose_dirs))
             self._lectures = lectures